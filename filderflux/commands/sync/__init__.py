@@ -1,5 +1,5 @@
 import argparse
-from filderflux.commands.sync.sync import handle_sync
+from filderflux.commands.sync.sync import DEFAULT_HASH_ALGORITHM, HASH_ALGORITHMS, REFLINK_MODES, handle_sync
 
 
 def add_sync_parser(subparsers: argparse._SubParsersAction) -> None:
@@ -9,4 +9,27 @@ def add_sync_parser(subparsers: argparse._SubParsersAction) -> None:
     parser_sync.add_argument(
         "-i", "--interval", type=float, default=1, help="The interval between runs held in seconds."
     )
+    parser_sync.add_argument(
+        "-c",
+        "--checksum",
+        action="store_true",
+        help="Compare the content of files with the same size and modification time as well.",
+    )
+    parser_sync.add_argument(
+        "--reflink",
+        choices=REFLINK_MODES,
+        default="auto",
+        help="Whether to reflink the copied files on file systems supporting it (like cp --reflink).",
+    )
+    parser_sync.add_argument(
+        "--hash",
+        choices=HASH_ALGORITHMS,
+        default=DEFAULT_HASH_ALGORITHM,
+        help="The algorithm the content of large files is hashed with, xxh3 requires the xxhash package.",
+    )
+    parser_sync.add_argument(
+        "--link",
+        action="store_true",
+        help="Hard link the replica files to the source files, copying them only across file systems.",
+    )
     parser_sync.set_defaults(func=handle_sync)
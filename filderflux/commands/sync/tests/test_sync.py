@@ -3,57 +3,97 @@ import tempfile
 import shutil
 import pathlib
 import signal
-import time
 import argparse
+import errno
+import logging
+import filecmp
+import sys
+import time
+import threading
 from threading import Thread
+from typing import Optional
+from unittest.mock import patch
+
+import pytest
+
 from filderflux.commands.sync.sync import (
     get_all_files,
     get_all_folders,
+    find_redundant_entries,
+    remove_entries,
     remove_redundant_files,
     remove_redundant_folders,
+    compare_contents,
+    compare_edges,
     compare_files,
     copy_folder,
     copy_file,
+    sync_file,
+    sync_files,
     sync_folder,
     handle_sync,
     build_path,
+    file_digest,
+    get_dirty_subtrees,
+    wait_for_changes,
+    load_manifest,
+    save_manifest,
+    scan,
+    to_path_set,
 )
 from filderflux.commands.sync import sync
+from filderflux.commands.sync.watcher import InotifyWatcher
 
 
 def test_shutdown_handler():
     """
-    Unit test the shutdown_handler function to ensure it sets the shutdown_flag to True.
+    Unit test the shutdown_handler function to ensure it sets the shutdown_event.
 
     This test simulates the behaviour of the shutdown_handler when it receives a SIGINT
-    signal. It first resets the shutdown_flag to False, then calls the shutdown_handler,
-    and finally asserts that the shutdown_flag has been set to True.
+    signal. It first clears the shutdown_event, then calls the shutdown_handler,
+    and finally asserts that the shutdown_event has been set.
 
-    The shutdown_handler function is expected to set the shutdown_flag to True when it
+    The shutdown_handler function is expected to set the shutdown_event when it
     handles a SIGINT signal, which is typically sent when a user interrupts the program
     (Ctrl+C).
 
     Raises:
-        AssertionError: If the shutdown_flag is not set to True after calling the
+        AssertionError: If the shutdown_event is not set after calling the
                         shutdown_handler.
     """
 
-    sync.shutdown_flag = False
+    sync.shutdown_event.clear()
 
     sync.shutdown_handler(signal.SIGINT, None)
 
-    assert sync.shutdown_flag, "Expected shutdown flag to be True after calling the shutdown handler."
+    assert sync.shutdown_event.is_set(), "Expected shutdown event to be set after calling the shutdown handler."
+
+
+# all temporary folders of the module are created in a single root, which pytest removes
+_temporary_root: Optional[str] = None
+
+
+@pytest.fixture(autouse=True, scope="module")
+def temporary_root(tmp_path_factory):
+    """
+    Create the root for the temporary folders of this module once.
+    """
+
+    global _temporary_root
+    _temporary_root = str(tmp_path_factory.mktemp("filderflux"))
+    yield
+    _temporary_root = None
 
 
 def create_temporary_folder():
     """
-    Create a temporary folder and return its path.
+    Create a temporary folder inside the root of the module and return its path.
 
     Returns:
     str: Path to the newly created temporary folder.
     """
 
-    return tempfile.mkdtemp()
+    return tempfile.mkdtemp(dir=_temporary_root)
 
 
 def create_temporary_file(folder: str, filename: str, content: str = "Sample content.") -> str:
@@ -111,10 +151,8 @@ def test_get_all_folders():
     subfolder = os.path.join(test_folder, "subfolder")
     os.makedirs(subfolder)
 
-    folders = get_all_folders(pathlib.Path(test_folder))
-    assert pathlib.Path(subfolder) in folders, f"Expected {subfolder} in folders."
-
-    shutil.rmtree(test_folder)
+    folders = get_all_folders(test_folder)
+    assert subfolder in folders, f"Expected {subfolder} in folders."
 
 
 def test_get_all_files():
@@ -134,11 +172,66 @@ def test_get_all_files():
     os.makedirs(subfolder)
     subfolder_file = create_temporary_file(subfolder, "subfile.txt")
 
-    files = get_all_files(pathlib.Path(test_folder))
-    assert pathlib.Path(test_file) in files, f"Expected {test_file} in files."
-    assert pathlib.Path(subfolder_file) in files, f"Expected {subfolder_file} in files."
+    files = get_all_files(test_folder)
+    assert test_file in files, f"Expected {test_file} in files."
+    assert subfolder_file in files, f"Expected {subfolder_file} in files."
+
+
+def test_scan():
+    """
+    Unit test to verify the functionality of scan function.
+
+    Creates a temporary source folder with a file and a subfolder containing another file,
+    then checks if scan maps every entry to its path in the replica folder and builds
+    the sets of replica folders and files to preserve, skipping files removed meanwhile.
+
+    Raises AssertionError if any entry is missing or mapped to an unexpected replica path.
+    """
+
+    source_folder = pathlib.Path(create_temporary_folder())
+    replica_folder = pathlib.Path("/replica")
+    create_temporary_file(str(source_folder), "file.txt")
+    os.makedirs(source_folder / "subfolder")
+    create_temporary_file(str(source_folder / "subfolder"), "subfile.txt")
+
+    folders, files, folders_to_preserve, files_to_preserve = scan(source_folder, replica_folder)
+
+    assert folders == [
+        (str(source_folder / "subfolder"), str(replica_folder / "subfolder"))
+    ], "Expected subfolder mapping."
+    assert {(file, replica_file) for file, replica_file, _ in files} == {
+        (str(source_folder / "file.txt"), str(replica_folder / "file.txt")),
+        (str(source_folder / "subfolder" / "subfile.txt"), str(replica_folder / "subfolder" / "subfile.txt")),
+    }, "Expected file mappings."
+    assert folders_to_preserve == {str(replica_folder / "subfolder")}, "Expected replica subfolder to be preserved."
+    assert files_to_preserve == {
+        str(replica_folder / "file.txt"),
+        str(replica_folder / "subfolder" / "subfile.txt"),
+    }, "Expected replica files to be preserved."
+
+    # a file removed between the listing and its stat is skipped
+    entries = list(sync.walk(source_folder))
+    os.remove(source_folder / "file.txt")
+    with patch.object(sync, "walk", return_value=iter(entries)):
+        _, files, _, files_to_preserve = scan(source_folder, replica_folder)
+
+    assert [file for file, _, _ in files] == [
+        str(source_folder / "subfolder" / "subfile.txt")
+    ], "Expected the removed file to be skipped."
+    assert str(replica_folder / "file.txt") not in files_to_preserve, "Expected the removed file not to be preserved."
+
+
+def test_to_path_set():
+    """
+    Unit test for the to_path_set function.
 
-    shutil.rmtree(test_folder)
+    Checks that strings and pathlib.Path objects are converted to the same normalised strings.
+    """
+
+    assert to_path_set([pathlib.Path("/home/user"), "/home/./user/", "/home/user/../user/documents"]) == {
+        os.path.normpath("/home/user"),
+        os.path.normpath("/home/user/documents"),
+    }, "Expected normalised strings."
 
 
 def test_remove_redundant_folders():
@@ -163,10 +256,8 @@ def test_remove_redundant_folders():
     remove_redundant_folders(pathlib.Path(test_folder), folders_to_preserve)
 
     remaining_folders = get_all_folders(pathlib.Path(test_folder))
-    assert pathlib.Path(subfolder1) in remaining_folders, f"Expected {subfolder1} in remaining folders."
-    assert pathlib.Path(subfolder2) not in remaining_folders, f"Expected {subfolder2} to be removed."
-
-    shutil.rmtree(test_folder)
+    assert subfolder1 in remaining_folders, f"Expected {subfolder1} in remaining folders."
+    assert subfolder2 not in remaining_folders, f"Expected {subfolder2} to be removed."
 
 
 def test_remove_redundant_files():
@@ -184,15 +275,55 @@ def test_remove_redundant_files():
     test_file1 = create_temporary_file(test_folder, "file1.txt")
     test_file2 = create_temporary_file(test_folder, "file2.txt")
 
-    files_to_preserve = {pathlib.Path(test_file1)}
+    files_to_preserve = {test_file1}
 
-    remove_redundant_files(pathlib.Path(test_folder), files_to_preserve)
+    remove_redundant_files(test_folder + os.sep, files_to_preserve)
 
     remaining_files = get_all_files(pathlib.Path(test_folder))
-    assert pathlib.Path(test_file1) in remaining_files, f"Expected {test_file1} in remaining files."
-    assert pathlib.Path(test_file2) not in remaining_files, f"Expected {test_file2} to be removed."
+    assert test_file1 in remaining_files, f"Expected {test_file1} in remaining files."
+    assert test_file2 not in remaining_files, f"Expected {test_file2} to be removed."
+
+
+def test_find_and_remove_entries():
+    """
+    Unit test for the find_redundant_entries and remove_entries functions.
+
+    Checks that the redundant folder and file are found without being removed, the preserved folder is
+    collected, the manifest is never reported while a file of its name elsewhere is and that remove_entries
+    removes all found entries, also if one of them is already gone.
+    """
 
-    shutil.rmtree(test_folder)
+    test_folder = create_temporary_folder()
+    subfolder1 = os.path.join(test_folder, "subfolder1")
+    os.makedirs(os.path.join(subfolder1, "nested"))
+    test_file1 = create_temporary_file(test_folder, "file1.txt")
+    manifest_path = create_temporary_file(test_folder, sync.MANIFEST_NAME)
+
+    subfolder2 = os.path.join(test_folder, "subfolder2")
+    os.makedirs(subfolder2)
+    existing_folders: set = set()
+    redundant = find_redundant_entries(
+        test_folder, {subfolder2}, set(), existing_folders=existing_folders, manifest_path=manifest_path
+    )
+
+    assert sorted(redundant) == [
+        (test_file1, False),
+        (subfolder1, True),
+    ], "Expected the redundant folder and file to be found."
+    assert os.path.isdir(subfolder1) and os.path.isfile(test_file1), "Expected nothing to be removed yet."
+    assert existing_folders == {subfolder2}, "Expected the preserved folder to be collected."
+
+    missing_file = os.path.join(test_folder, "missing.txt")
+    assert remove_entries(redundant + [(missing_file, False)]) == 2, "Expected the removed entries to be counted."
+    assert sorted(os.listdir(test_folder)) == [
+        sync.MANIFEST_NAME,
+        "subfolder2",
+    ], "Expected only the manifest and the preserved folder to remain."
+
+    nested_manifest = create_temporary_file(subfolder2, sync.MANIFEST_NAME)
+    assert find_redundant_entries(subfolder2, set(), set(), manifest_path=manifest_path) == [
+        (nested_manifest, False)
+    ], "Expected a file of the manifest's name outside the replica root to be found."
 
 
 def test_build_path():
@@ -210,39 +341,44 @@ def test_build_path():
     """
 
     # basic test case
-    folder_path = pathlib.Path("/home/user")
-    name = pathlib.Path("documents")
-    expected_path = pathlib.Path("/home/user/documents")
+    folder_path = "/home/user"
+    name = "documents"
+    expected_path = "/home/user/documents"
     assert build_path(folder_path, name) == expected_path, "Expected path to be '/home/user/documents'"
 
     # nested name
-    name = pathlib.Path("documents/reports")
-    expected_path = pathlib.Path("/home/user/documents/reports")
+    name = "documents/reports"
+    expected_path = "/home/user/documents/reports"
     assert build_path(folder_path, name) == expected_path, "Expected path to be '/home/user/documents/reports'"
 
     # empty name
-    name = pathlib.Path("")
-    expected_path = pathlib.Path("/home/user")
+    name = ""
+    expected_path = "/home/user"
     assert build_path(folder_path, name) == expected_path, "Expected path to be '/home/user'"
 
     # root path
-    folder_path = pathlib.Path("/")
-    name = pathlib.Path("home/user")
-    expected_path = pathlib.Path("/home/user")
+    folder_path = "/"
+    name = "home/user"
+    expected_path = "/home/user"
     assert build_path(folder_path, name) == expected_path, "Expected path to be '/home/user'"
 
     # relative folder path
-    folder_path = pathlib.Path("home/user")
-    name = pathlib.Path("documents")
-    expected_path = pathlib.Path("home/user/documents")
+    folder_path = "home/user"
+    name = "documents"
+    expected_path = "home/user/documents"
     assert build_path(folder_path, name) == expected_path, "Expected path to be 'home/user/documents'"
 
     # special characters
-    folder_path = pathlib.Path("/home/user")
-    name = pathlib.Path("docu#ments/repo@rts")
-    expected_path = pathlib.Path("/home/user/docu#ments/repo@rts")
+    folder_path = "/home/user"
+    name = "docu#ments/repo@rts"
+    expected_path = "/home/user/docu#ments/repo@rts"
     assert build_path(folder_path, name) == expected_path, "Expected path to be '/home/user/docu#ments/repo@rts'"
 
+    # paths are accepted at the boundary
+    assert (
+        build_path(pathlib.Path("/home/user"), pathlib.Path("documents")) == "/home/user/documents"
+    ), "Expected pathlib.Path arguments to be joined into a string."
+
 
 def test_compare_files():
     """
@@ -284,8 +420,177 @@ def test_compare_files():
 
     # test two blank files
     assert compare_files(pathlib.Path(file5), pathlib.Path(file6)), "Expected two blank files to be identical"
+    with patch("filderflux.commands.sync.sync.filecmp.cmp") as cmp:
+        assert compare_files(file5, file6, checksum=True), "Expected two blank files to be identical with checksum"
+    cmp.assert_not_called()
+
 
-    shutil.rmtree(test_folder)
+def test_compare_files_quick_check():
+    """
+    Unit test for the quick check of the compare_files function.
+
+    - Tests files of the same size and modification time are considered identical without reading them.
+    - Tests the contents of such files are compared when checksum is requested.
+    - Tests files of the same size but different modification times are compared by their contents.
+    - Tests checksum does not trust outcomes or digests cached for the same size and modification time.
+    """
+
+    test_folder = create_temporary_folder()
+
+    file1 = create_temporary_file(test_folder, "file1.txt", "This is some content.")
+    file2 = create_temporary_file(test_folder, "file2.txt", "This is same content.")
+    os.utime(file1, ns=(1_000_000_000, 1_000_000_000))
+    os.utime(file2, ns=(1_000_000_000, 1_000_000_000))
+
+    # same size and modification time
+    assert compare_files(pathlib.Path(file1), pathlib.Path(file2)), "Expected the quick check to match."
+
+    # checksum requested
+    assert not compare_files(
+        pathlib.Path(file1), pathlib.Path(file2), checksum=True
+    ), "Expected the contents to be compared."
+
+    # different modification times
+    os.utime(file2, ns=(2_000_000_000, 2_000_000_000))
+    assert not compare_files(pathlib.Path(file1), pathlib.Path(file2)), "Expected the contents to be compared."
+
+    # a file corrupted in place keeping its size and modification time, after its outcome and digest were cached
+    for size in (16, sync.DIGEST_THRESHOLD):
+        file3 = create_temporary_file(test_folder, "file3.txt", "a" * size)
+        file4 = create_temporary_file(test_folder, "file4.txt", "a" * size)
+        for path in (file3, file4):
+            os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+        assert compare_files(file3, file4, checksum=True), "Expected identical files to match."
+        assert filecmp.cmp(file3, file4, shallow=False), "Expected filecmp to cache the outcome."
+        assert file_digest(file3) == file_digest(file4), "Expected the digests to be cached."
+        with open(file4, "r+") as file:
+            file.seek(size // 2)
+            file.write("b")
+        os.utime(file4, ns=(1_000_000_000, 1_000_000_000))
+        assert not compare_files(file3, file4, checksum=True), "Expected the corruption to be found with checksum."
+
+
+def test_compare_contents():
+    """
+    Unit test for the compare_contents function used for large files.
+
+    - Tests comparing two identical files spanning several chunks.
+    - Tests comparing two files differing in their last chunk only.
+    - Tests comparing two files differing in a full chunk.
+    - Tests comparing two blank files.
+
+    The chunk size is lowered so that small temporary files span several chunks.
+    """
+
+    test_folder = create_temporary_folder()
+
+    file1 = create_temporary_file(test_folder, "file1.txt", "This is some content.")
+    file2 = create_temporary_file(test_folder, "file2.txt", "This is some content.")
+    file3 = create_temporary_file(test_folder, "file3.txt", "This is some content!")
+    file4 = create_blank_temporary_file(test_folder, "file4.txt")
+    file5 = create_blank_temporary_file(test_folder, "file5.txt")
+    file6 = create_temporary_file(test_folder, "file6.txt", "This is same content.")
+
+    with patch.object(sync, "COMPARE_CHUNK_SIZE", 4):
+        # identical files
+        assert compare_contents(pathlib.Path(file1), pathlib.Path(file2)), "Expected files to be identical."
+
+        # different last chunk
+        assert not compare_contents(pathlib.Path(file1), pathlib.Path(file3)), "Expected files to be different."
+
+        # different full chunk
+        assert not compare_contents(pathlib.Path(file1), pathlib.Path(file6)), "Expected files to be different."
+
+        # blank files
+        assert compare_contents(pathlib.Path(file4), pathlib.Path(file5)), "Expected two blank files to be identical."
+
+
+def test_compare_edges():
+    """
+    Unit test for the compare_edges function.
+
+    - Tests that files differing in their first or last block are found different.
+    - Tests that files differing only in the middle are left to the full comparison.
+    """
+
+    folder = create_temporary_folder()
+    content = "a" * 3 * 4096
+    file1 = create_temporary_file(folder, "file1.txt", content)
+    file2 = create_temporary_file(folder, "file2.txt", "b" + content[1:])
+    file3 = create_temporary_file(folder, "file3.txt", content[:-1] + "b")
+    file4 = create_temporary_file(folder, "file4.txt", content[:6000] + "b" + content[6001:])
+    size = len(content)
+
+    assert not compare_edges(file1, file2, size), "Expected files with different first blocks to differ."
+    assert not compare_edges(file1, file3, size), "Expected files with different last blocks to differ."
+    assert compare_edges(file1, file4, size), "Expected files differing in the middle to pass."
+    assert not compare_contents(file1, file4), "Expected the full comparison to find the difference."
+
+
+def test_compare_files_by_digest():
+    """
+    Unit test for the digest based comparison of large files in the compare_files function.
+
+    - Tests comparing two identical files by their digests.
+    - Tests comparing two files of the same size with different content by their digests.
+    - Tests that the digest of an unchanged file is served from the cache.
+
+    The digest threshold is lowered so that small temporary files take the digest path.
+    Every available hash algorithm is tested.
+    """
+
+    test_folder = create_temporary_folder()
+
+    file1 = create_temporary_file(test_folder, "file1.txt", "This is some content.")
+    file2 = create_temporary_file(test_folder, "file2.txt", "This is some content.")
+    file3 = create_temporary_file(test_folder, "file3.txt", "This is same content.")
+
+    for hash_algorithm in sync.HASH_ALGORITHMS:
+        with patch.object(sync, "DIGEST_THRESHOLD", 1):
+            # identical files
+            assert compare_files(
+                pathlib.Path(file1), pathlib.Path(file2), checksum=True, hash_algorithm=hash_algorithm
+            ), "Expected files to be identical."
+
+            # same size, different content
+            assert not compare_files(
+                pathlib.Path(file1), pathlib.Path(file3), checksum=True, hash_algorithm=hash_algorithm
+            ), "Expected files to be different."
+
+        # unchanged file is not read again
+        digest = file_digest(pathlib.Path(file1), hash_algorithm=hash_algorithm)
+        with patch.object(sync.mmap, "mmap", side_effect=AssertionError("file was hashed again")):
+            assert (
+                file_digest(pathlib.Path(file1), hash_algorithm=hash_algorithm) == digest
+            ), "Expected the cached digest to be reused."
+
+
+def test_manifest():
+    """
+    Unit test for the save_manifest and load_manifest functions.
+
+    - Tests that the digests of replica files survive a restart (a cleared digest cache).
+    - Tests that the manifest is preserved when redundant entries are removed.
+    """
+
+    replica_folder = create_temporary_folder()
+    replica_file = create_temporary_file(replica_folder, "file.txt", "Some content.")
+    digest = file_digest(replica_file)
+
+    manifest = save_manifest(replica_folder, {})
+    assert manifest == {
+        "file.txt": [os.stat(replica_file).st_size, os.stat(replica_file).st_mtime_ns, digest.hex()]
+    }, "Expected the digest of the replica file in the manifest."
+    assert save_manifest(replica_folder, manifest) is manifest, "Expected an unchanged manifest not to be saved."
+
+    sync._digest_cache.clear()
+    assert load_manifest(replica_folder) == manifest, "Expected the saved manifest to be loaded."
+    with patch.object(sync.mmap, "mmap", side_effect=AssertionError("file was hashed again")):
+        assert file_digest(replica_file) == digest, "Expected the digest to be taken from the manifest."
+
+    manifest_path = os.path.join(replica_folder, sync.MANIFEST_NAME)
+    remove_entries(find_redundant_entries(replica_folder, set(), set(), manifest_path=manifest_path))
+    assert os.path.exists(manifest_path), "Expected the manifest to be kept."
 
 
 def test_copy_file():
@@ -317,7 +622,172 @@ def test_copy_file():
 
     assert not os.path.exists(non_existing_replica), "Expected the replica file not to exist for non-existing source."
 
-    shutil.rmtree(test_folder)
+
+def test_copy_file_link():
+    """
+    Unit test for copy_file with link.
+
+    - Tests that the replica file is hard linked to the source file, replacing an existing replica file.
+    - Tests that linked files are identical without being read, even with checksum.
+    - Tests that the file is copied when the files cannot be linked (different file systems).
+    """
+
+    test_folder = create_temporary_folder()
+    source_file = create_temporary_file(test_folder, "source_file.txt", "This is some content.")
+    replica_file = create_temporary_file(test_folder, "replica_file.txt", "This is some outdated content.")
+
+    assert copy_file(source_file, replica_file, link=True), "Expected the file to be linked."
+    assert os.path.samefile(source_file, replica_file), "Expected the replica file to be a hard link."
+    with patch("filderflux.commands.sync.sync.filecmp.cmp") as cmp:
+        assert compare_files(source_file, replica_file, checksum=True), "Expected linked files to be identical."
+    cmp.assert_not_called()
+
+    os.unlink(replica_file)
+    with patch("filderflux.commands.sync.sync.os.link", side_effect=OSError(errno.EXDEV, "Cross-device link")):
+        assert copy_file(source_file, replica_file, link=True), "Expected the file to be copied instead."
+    assert not os.path.samefile(source_file, replica_file), "Expected the replica file to be a copy."
+    with open(replica_file, "r") as file:
+        assert file.read() == "This is some content.", "Expected the replica file content to match the source file."
+
+
+def test_copy_file_metadata_and_fallback():
+    """
+    Unit test for the copy_file function covering metadata and the fallback copy.
+
+    - Tests the modification time of the source file is preserved on the replica file.
+    - Tests the content is still copied when os.copy_file_range is refused by the file system.
+    - Tests a source file rewritten during the copy does not pass its new modification time to the replica.
+
+    Each test case asserts the expected behaviour of the copy_file function.
+    """
+
+    test_folder = create_temporary_folder()
+    source_file = create_temporary_file(test_folder, "source_file.txt", "This is some content.")
+    os.utime(source_file, ns=(1_000_000_000, 1_000_000_000))
+
+    # preserved metadata
+    replica_file = os.path.join(test_folder, "replica_file.txt")
+    copy_file(pathlib.Path(source_file), pathlib.Path(replica_file))
+
+    assert os.stat(replica_file).st_mtime_ns == 1_000_000_000, "Expected the modification time to be preserved."
+
+    # refused in-kernel copy
+    replica_file = os.path.join(test_folder, "fallback_replica_file.txt")
+    with patch.object(
+        sync.os, "copy_file_range", side_effect=OSError(errno.EXDEV, "Invalid cross-device link"), create=True
+    ):
+        copy_file(pathlib.Path(source_file), pathlib.Path(replica_file))
+
+    with open(replica_file, "r") as file:
+        assert file.read() == "This is some content.", "Expected the fallback copy to match the source file."
+
+    # the source is rewritten while being copied
+    replica_file = os.path.join(test_folder, "raced_replica_file.txt")
+    copyfile = shutil.copyfile
+
+    def racing_copyfile(source: str, replica: str) -> None:
+        copyfile(source, replica)
+        with open(source, "w") as file:
+            file.write("This is some CONTENT.")
+        os.utime(source, ns=(2_000_000_000, 2_000_000_000))
+
+    with patch.object(sync.shutil, "copyfile", side_effect=racing_copyfile):
+        copy_file(source_file, replica_file, reflink="never")
+
+    assert os.stat(replica_file).st_mtime_ns == 1_000_000_000, "Expected the times from before the copy."
+    assert not compare_files(source_file, replica_file), "Expected the next round to find the files differ."
+
+
+def test_copy_file_reflink():
+    """
+    Unit test for the reflink modes of the copy_file function.
+
+    - Tests the content is copied when a reflink is refused in the "auto" mode.
+    - Tests the content is not copied when a reflink is refused in the "always" mode.
+    - Tests no reflink is attempted in the "never" mode.
+    - Tests a refused reflink is not attempted again between the same file systems in the "auto" mode.
+
+    The reflink is refused by patching reflink_file, the temporary folder might support reflinks.
+    """
+
+    sync._reflink_unsupported.clear()
+    test_folder = create_temporary_folder()
+    source_file = create_temporary_file(test_folder, "source_file.txt", "This is some content.")
+    refused = OSError(errno.EOPNOTSUPP, "Operation not supported")
+
+    # refused reflink, auto mode
+    replica_file = os.path.join(test_folder, "auto_replica_file.txt")
+    with patch.object(sync, "reflink_file", side_effect=refused):
+        copy_file(pathlib.Path(source_file), pathlib.Path(replica_file), reflink="auto")
+
+    with open(replica_file, "r") as file:
+        assert file.read() == "This is some content.", "Expected the content to be copied."
+
+    # refused reflink, always mode
+    replica_file = os.path.join(test_folder, "always_replica_file.txt")
+    with patch.object(sync, "reflink_file", side_effect=refused):
+        copy_file(pathlib.Path(source_file), pathlib.Path(replica_file), reflink="always")
+
+    assert not os.path.exists(replica_file), "Expected the replica file not to be created."
+
+    # never mode
+    replica_file = os.path.join(test_folder, "never_replica_file.txt")
+    with patch.object(sync, "reflink_file", side_effect=AssertionError("reflink attempted")):
+        copy_file(pathlib.Path(source_file), pathlib.Path(replica_file), reflink="never")
+
+    with open(replica_file, "r") as file:
+        assert file.read() == "This is some content.", "Expected the content to be copied."
+
+    # refused reflink, remembered for the file systems in auto mode
+    sync._reflink_unsupported.clear()
+    with patch.object(sync, "reflink_file", side_effect=refused) as reflink_file:
+        for name in ("first_replica_file.txt", "second_replica_file.txt"):
+            assert copy_file(source_file, os.path.join(test_folder, name), reflink="auto"), "Expected a copy."
+        assert reflink_file.call_count == 1, "Expected the refused reflink not to be attempted again."
+
+        copy_file(source_file, os.path.join(test_folder, "always_replica_file.txt"), reflink="always")
+        assert reflink_file.call_count == 2, "Expected the always mode to attempt the reflink anyway."
+
+    with open(os.path.join(test_folder, "second_replica_file.txt"), "r") as file:
+        assert file.read() == "This is some content.", "Expected the content to be copied."
+    sync._reflink_unsupported.clear()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reflinks are only supported on Linux")
+def test_reflink_file():
+    """
+    Unit test for the reflink_file function.
+
+    Reflinks an empty and a shorter source file over existing replica files. Where the file system supports
+    reflinks, the replica files must match the source files, otherwise the replica files must stay intact.
+    In both cases no temporary file may be left behind.
+    """
+
+    test_folder = create_temporary_folder()
+    for content in ("", "Short."):
+        source_file = create_temporary_file(test_folder, "source_file.txt", content)
+        replica_file = create_temporary_file(test_folder, "replica_file.txt", "This is some outdated content.")
+
+        try:
+            sync.reflink_file(source_file, replica_file)
+        except OSError:
+            expected = "This is some outdated content."
+        else:
+            expected = content
+
+        with open(replica_file, "r") as file:
+            assert file.read() == expected, "Expected the replica file to be either cloned whole or left intact."
+        assert sorted(os.listdir(test_folder)) == [
+            "replica_file.txt",
+            "source_file.txt",
+        ], "Expected no temporary file to be left behind."
+
+    # a failed clone does not create the replica file
+    os.unlink(replica_file)
+    with patch("fcntl.ioctl", side_effect=OSError(errno.EOPNOTSUPP, "Operation not supported")):
+        with pytest.raises(OSError):
+            sync.reflink_file(source_file, replica_file)
+    assert os.listdir(test_folder) == ["source_file.txt"], "Expected no replica file to be created."
 
 
 def test_copy_folder():
@@ -325,6 +795,7 @@ def test_copy_folder():
     Unit test for the copy_folder function.
 
     - Tests copying an existing source folder to a replica folder.
+    - Tests copying nested subfolders and files to the same relative paths.
 
     Each test case asserts the expected behaviour of the copy_folder function.
     """
@@ -334,12 +805,125 @@ def test_copy_folder():
     source_folder = create_temporary_folder()
     replica_folder = os.path.join(test_folder, "replica_folder")
 
-    copy_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder), pathlib.Path(source_folder).parent)
+    copy_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder))
 
     assert os.path.exists(replica_folder), "Expected the replica folder to exist after copying."
 
-    shutil.rmtree(test_folder)
-    shutil.rmtree(source_folder)
+    # nested subfolders and files
+    os.makedirs(os.path.join(source_folder, "subfolder", "subsubfolder"))
+    create_temporary_file(os.path.join(source_folder, "subfolder", "subsubfolder"), "file.txt")
+
+    copy_folder(source_folder, replica_folder)
+
+    assert os.path.isfile(
+        os.path.join(replica_folder, "subfolder", "subsubfolder", "file.txt")
+    ), "Expected the nested file to keep its relative path."
+
+
+def test_sync_file():
+    """
+    Unit test for the sync_file function.
+
+    - Tests copying a source file which is missing in the replica.
+    - Tests overwriting a replica file whose content differs from the source file.
+    - Tests a file removed while being compared does not raise.
+
+    Each test case asserts the replica file content matches the source file afterwards.
+    """
+
+    test_folder = create_temporary_folder()
+    source_file = create_temporary_file(test_folder, "source_file.txt", "This is some content.")
+    replica_file = os.path.join(test_folder, "replica_file.txt")
+
+    # missing replica file
+    sync_file(pathlib.Path(source_file), pathlib.Path(replica_file))
+
+    with open(replica_file, "r") as file:
+        assert file.read() == "This is some content.", "Expected the missing replica file to be copied."
+
+    # outdated replica file
+    create_temporary_file(test_folder, "replica_file.txt", "This is some outdated content.")
+
+    sync_file(pathlib.Path(source_file), pathlib.Path(replica_file))
+
+    with open(replica_file, "r") as file:
+        assert file.read() == "This is some content.", "Expected the outdated replica file to be overwritten."
+
+    # identical replica file with a different modification time
+    os.utime(replica_file, ns=(1_000_000_000, 1_000_000_000))
+
+    sync_file(pathlib.Path(source_file), pathlib.Path(replica_file))
+
+    assert (
+        os.stat(replica_file).st_mtime_ns == os.stat(source_file).st_mtime_ns
+    ), "Expected the modification time of the source file to be set on the replica file."
+
+    # a file removed while being compared
+    with patch.object(sync, "compare_files", side_effect=FileNotFoundError(errno.ENOENT, "No such file")):
+        assert not sync_file(source_file, replica_file), "Expected the error to be logged, not raised."
+
+
+def test_run_jobs():
+    """
+    Unit test for the run_jobs function.
+
+    Checks that the results are counted and that a slow job does not hold up the following ones
+    although only two jobs may be pending at once.
+    """
+
+    slow_job_started = threading.Event()
+    slow_job_release = threading.Event()
+    finished = []
+
+    def job(item: int) -> bool:
+        if item == 0:
+            slow_job_started.set()
+            # released once all the other jobs finished, which needs them to run past the slow one
+            assert slow_job_release.wait(timeout=5), "Expected the other jobs not to wait for the slow one."
+        finished.append(item)
+        if len(finished) == 9:
+            slow_job_release.set()
+        return item % 2 == 0
+
+    with patch.object(sync, "MAX_PENDING_JOBS", 2):
+        assert sync.run_jobs(job, range(10)) == 5, "Expected the items the job returned True for to be counted."
+    assert slow_job_started.is_set() and finished[-1] == 0, "Expected the slow job to finish last."
+
+
+def test_sync_files():
+    """
+    Unit test for the sync_files function.
+
+    - Tests synchronising more files than jobs may be pending at once.
+    - Tests copying files known to be missing without comparing them.
+
+    The number of pending jobs is lowered so that a handful of files needs finished jobs to be replaced.
+    """
+
+    source_folder = create_temporary_folder()
+    replica_folder = create_temporary_folder()
+    files = []
+    for index in range(5):
+        source_file = create_temporary_file(source_folder, f"file{index}.txt", f"Content {index}.")
+        files.append((source_file, os.path.join(replica_folder, f"file{index}.txt"), os.stat(source_file)))
+
+    with patch.object(sync, "MAX_PENDING_JOBS", 2):
+        copied = sync_files(files)
+
+    assert copied == 5, "Expected the number of copied files to be returned."
+
+    # files known to be missing are copied without being compared
+    shutil.rmtree(replica_folder)
+    os.makedirs(replica_folder)
+    with patch.object(sync, "compare_files") as compare_files_mock:
+        copied = sync_files(files, missing_files={replica_file for _, replica_file, _ in files})
+
+    assert copied == 5, "Expected all missing files to be copied."
+    compare_files_mock.assert_not_called()
+
+    assert {os.path.basename(file) for file in get_all_files(replica_folder)} == {
+        f"file{index}.txt" for index in range(5)
+    }, "Expected all files to be copied."
 
 
 def test_sync_folder():
@@ -361,8 +945,8 @@ def test_sync_folder():
 
     sync_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder))
 
-    assert get_all_folders(pathlib.Path(replica_folder)) == set(), "Expected replica folder to remain empty."
-    assert get_all_files(pathlib.Path(replica_folder)) == set(), "Expected replica folder to remain empty."
+    assert get_all_folders(replica_folder) == set(), "Expected replica folder to remain empty."
+    assert get_all_files(replica_folder) == set(), "Expected replica folder to remain empty."
 
     # source folder contains only files
     source_folder = create_temporary_folder()
@@ -371,8 +955,8 @@ def test_sync_folder():
 
     sync_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder))
 
-    assert get_all_folders(pathlib.Path(replica_folder)) == set(), "Expected replica folder to remain empty."
-    assert {file.name for file in get_all_files(pathlib.Path(replica_folder))} == {
+    assert get_all_folders(replica_folder) == set(), "Expected replica folder to remain empty."
+    assert {os.path.basename(file) for file in get_all_files(replica_folder)} == {
         os.path.basename(source_file)  # extract last component of the path
     }, "Expected files to be copied."
 
@@ -384,10 +968,10 @@ def test_sync_folder():
 
     sync_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder))
 
-    assert {folder.name for folder in get_all_folders(pathlib.Path(replica_folder))} == {
+    assert {os.path.basename(folder) for folder in get_all_folders(replica_folder)} == {
         os.path.basename(subfolder)
     }, "Expected subfolders to be copied."
-    assert get_all_files(pathlib.Path(replica_folder)) == set(), "Expected replica folder to contain only subfolders."
+    assert get_all_files(replica_folder) == set(), "Expected replica folder to contain only subfolders."
 
     # source folder contains both files and subfolders
     source_folder = create_temporary_folder()
@@ -398,10 +982,10 @@ def test_sync_folder():
 
     sync_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder))
 
-    assert {folder.name for folder in get_all_folders(pathlib.Path(replica_folder))} == {
+    assert {os.path.basename(folder) for folder in get_all_folders(replica_folder)} == {
         os.path.basename(subfolder)
     }, "Expected subfolders to be copied."
-    assert {file.name for file in get_all_files(pathlib.Path(replica_folder))} == {
+    assert {os.path.basename(file) for file in get_all_files(replica_folder)} == {
         os.path.basename(source_file)
     }, "Expected files to be copied."
 
@@ -416,15 +1000,165 @@ def test_sync_folder():
 
     sync_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder))
 
-    assert {folder.name for folder in get_all_folders(pathlib.Path(replica_folder))} == {
+    assert {os.path.basename(folder) for folder in get_all_folders(replica_folder)} == {
         os.path.basename(subfolder)
     }, "Expected subfolders to be synchronised."
-    assert {file.name for file in get_all_files(pathlib.Path(replica_folder))} == {
+    assert {os.path.basename(file) for file in get_all_files(replica_folder)} == {
         os.path.basename(source_file)
     }, "Expected only the source file to be synchronised."
 
-    shutil.rmtree(replica_folder)
-    shutil.rmtree(source_folder)
+
+def test_sync_folder_nested():
+    """
+    Unit test for the sync_folder function on nested folders.
+
+    - Tests copying files located several levels deep into subfolders missing in the replica.
+    - Tests removing redundant files and folders located several levels deep in the replica.
+    - Tests replacing a replica file with a folder of the same name in the source.
+
+    Each test case asserts the replica folder mirrors the source folder afterwards.
+    """
+
+    source_folder = create_temporary_folder()
+    deep_folder = os.path.join(source_folder, "level1", "level2")
+    os.makedirs(deep_folder)
+    create_temporary_file(deep_folder, "deep_file.txt", "This is some deep content.")
+    os.makedirs(os.path.join(source_folder, "was_file"))
+
+    replica_folder = create_temporary_folder()
+    redundant_folder = os.path.join(replica_folder, "level1", "redundant")
+    os.makedirs(redundant_folder)
+    create_temporary_file(redundant_folder, "redundant_file.txt")
+    create_temporary_file(os.path.join(replica_folder, "level1"), "redundant_file.txt")
+    create_temporary_file(replica_folder, "was_file")
+
+    sync_folder(pathlib.Path(source_folder), pathlib.Path(replica_folder))
+
+    assert {os.path.relpath(folder, replica_folder) for folder in get_all_folders(replica_folder)} == {
+        "level1",
+        os.path.join("level1", "level2"),
+        "was_file",
+    }, "Expected the replica folders to mirror the source folders."
+    assert {os.path.relpath(file, replica_folder) for file in get_all_files(replica_folder)} == {
+        os.path.join("level1", "level2", "deep_file.txt")
+    }, "Expected the replica files to mirror the source files."
+
+
+def test_sync_folder_symlinks():
+    """
+    Unit test for the sync_folder function on symbolic links in the source folder.
+
+    - Tests that a linked folder is copied by the first round and kept by the following rounds.
+    - Tests that a change in the linked folder is copied by a following round.
+    - Tests that a link looping back to its own tree is skipped by every round.
+    - Tests that a link in the replica folder is replaced by a copy, never followed.
+
+    Each test case asserts the replica folder holds copies of the linked entries.
+    """
+
+    linked_folder = create_temporary_folder()
+    linked_file = create_temporary_file(linked_folder, "a.txt", "Linked content.")
+    source_folder = create_temporary_folder()
+    os.makedirs(os.path.join(source_folder, "folder"))
+    os.symlink(linked_folder, os.path.join(source_folder, "link"))
+    os.symlink(source_folder, os.path.join(source_folder, "folder", "loop"))
+    replica_folder = os.path.join(create_temporary_folder(), "replica")
+
+    expected_folders = {"folder", "link"}
+    expected_files = {os.path.join("link", "a.txt")}
+    for round_number in range(3):
+        if round_number == 2:
+            create_temporary_file(linked_folder, "a.txt", "Changed linked content.")
+        sync_folder(source_folder, replica_folder)
+
+        assert {
+            os.path.relpath(folder, replica_folder) for folder in get_all_folders(replica_folder)
+        } == expected_folders, f"Expected the linked folder to be a replica folder in round {round_number}."
+        assert {
+            os.path.relpath(file, replica_folder) for file in get_all_files(replica_folder)
+        } == expected_files, f"Expected the linked file to be kept in round {round_number}."
+        assert filecmp.cmp(
+            linked_file, os.path.join(replica_folder, "link", "a.txt"), shallow=False
+        ), f"Expected the content of the linked file in round {round_number}."
+        assert not os.path.islink(os.path.join(replica_folder, "link")), "Expected a copy of the linked folder."
+
+    # a link the replica got meanwhile must not let the synchronisation write into the folder it points to
+    shutil.rmtree(os.path.join(replica_folder, "link"))
+    os.symlink(create_temporary_folder(), os.path.join(replica_folder, "link"))
+    sync_folder(source_folder, replica_folder)
+
+    assert not os.path.islink(os.path.join(replica_folder, "link")), "Expected the replica link to be replaced."
+    assert {
+        os.path.relpath(file, replica_folder) for file in get_all_files(replica_folder)
+    } == expected_files, "Expected the linked file to be copied again."
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_wait_for_changes():
+    """
+    Unit test for the wait_for_changes function.
+
+    - Tests that no changes are returned once the timeout elapses.
+    - Tests that a burst of changes is returned at once, well before the timeout.
+    - Tests that the wait ends immediately when the shutdown event is set.
+    """
+
+    folder = create_temporary_folder()
+    watcher = InotifyWatcher()
+    watcher.watch_tree(folder)
+    sync.shutdown_event.clear()
+
+    assert wait_for_changes(watcher, 0.01) == set(), "Expected no changes."
+
+    subfolder = os.path.join(folder, "subfolder")
+    os.mkdir(subfolder)
+    create_temporary_file(subfolder, "file.txt")
+    start = time.monotonic()
+    assert wait_for_changes(watcher, 30) == {folder, subfolder}, "Expected the burst of changes to be returned."
+    assert time.monotonic() - start < 5, "Expected the changes to be returned once they settled."
+
+    sync.shutdown_event.set()
+    assert wait_for_changes(watcher, 30) == set(), "Expected no waiting after the shutdown signal."
+    sync.shutdown_event.clear()
+    watcher.close()
+
+
+def test_get_dirty_subtrees():
+    """
+    Unit test to verify the functionality of get_dirty_subtrees function.
+
+    Creates source and replica folders with nested subfolders, then checks that changed folders of both trees
+    are reduced to the topmost subtrees relative to the roots, that removed folders are synchronised from their
+    parent and that a changed root means the whole tree.
+
+    Raises AssertionError if the subtrees are not as expected.
+    """
+
+    source_folder = create_temporary_folder()
+    replica_folder = create_temporary_folder()
+    for root in (source_folder, replica_folder):
+        os.makedirs(os.path.join(root, "a", "b"))
+        os.makedirs(os.path.join(root, "c"))
+
+    changed = {
+        os.path.join(source_folder, "a", "b"),
+        os.path.join(replica_folder, "a"),
+        os.path.join(replica_folder, "c"),
+    }
+    assert get_dirty_subtrees(changed, source_folder, replica_folder) == [
+        "a",
+        "c",
+    ], "Expected nested subtrees to be merged."
+
+    changed = {os.path.join(source_folder, "c", "removed")}
+    assert get_dirty_subtrees(changed, source_folder, replica_folder) == [
+        "c"
+    ], "Expected removed folder to be synchronised from its parent."
+
+    changed = {source_folder, os.path.join(source_folder, "a")}
+    assert get_dirty_subtrees(changed, source_folder, replica_folder) == [""], "Expected the whole tree."
+
+    assert get_dirty_subtrees(set(), source_folder, replica_folder) == [], "Expected nothing to synchronise."
 
 
 def test_handle_sync():
@@ -438,17 +1172,30 @@ def test_handle_sync():
     - Tests interruption of synchronisation process upon receiving a shutdown signal.
 
     Each test case verifies the expected behaviour of the handle_sync function based on different scenarios.
+    The rounds are awaited with sync._cycle_complete instead of fixed sleeps and the interruption is awaited
+    by joining the thread with a timeout.
     """
 
+    # with the shutdown event set, handle_sync returns after a single round
+    sync.shutdown_event.set()
+
     # both source and replica folders are empty
     source_folder = create_temporary_folder()
     replica_folder = create_temporary_folder()
 
-    args = argparse.Namespace(source=source_folder, replica=replica_folder, interval=1)
+    args = argparse.Namespace(
+        source=source_folder,
+        replica=replica_folder,
+        interval=1,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
     handle_sync(args)
 
-    assert get_all_folders(pathlib.Path(replica_folder)) == set(), "Expected replica folder to remain empty."
-    assert get_all_files(pathlib.Path(replica_folder)) == set(), "Expected replica folder to remain empty."
+    assert get_all_folders(replica_folder) == set(), "Expected replica folder to remain empty."
+    assert get_all_files(replica_folder) == set(), "Expected replica folder to remain empty."
 
     # the replica folder already exists -> update is needed
     source_folder = create_temporary_folder()
@@ -459,13 +1206,21 @@ def test_handle_sync():
     replica_subfolder = os.path.join(replica_folder, "subfolder")
     os.makedirs(replica_subfolder)
 
-    args = argparse.Namespace(source=source_folder, replica=replica_folder, interval=1)
+    args = argparse.Namespace(
+        source=source_folder,
+        replica=replica_folder,
+        interval=1,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
     handle_sync(args)
 
-    assert {folder.name for folder in get_all_folders(pathlib.Path(replica_folder))} == {
+    assert {os.path.basename(folder) for folder in get_all_folders(replica_folder)} == {
         os.path.basename(subfolder)
     }, "Expected subfolders to be synced."
-    assert {file.name for file in get_all_files(pathlib.Path(replica_folder))} == {
+    assert {os.path.basename(file) for file in get_all_files(replica_folder)} == {
         os.path.basename(source_file)
     }, "Expected only the source file to be synced."
 
@@ -473,7 +1228,15 @@ def test_handle_sync():
     non_existing_source_folder = "/non_existing_source"
     non_existing_replica_folder = "/non_existing_replica"
 
-    args = argparse.Namespace(source=non_existing_source_folder, replica=non_existing_replica_folder, interval=1)
+    args = argparse.Namespace(
+        source=non_existing_source_folder,
+        replica=non_existing_replica_folder,
+        interval=1,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
     handle_sync(args)
 
     assert not os.path.exists(non_existing_source_folder), "Expected source folder not to be created."
@@ -484,17 +1247,25 @@ def test_handle_sync():
     source_file = create_temporary_file(source_folder, "source_file.txt", "This is some content.")
     replica_folder = create_temporary_folder()
 
-    args = argparse.Namespace(source=source_folder, replica=replica_folder, interval=1)
+    args = argparse.Namespace(
+        source=source_folder,
+        replica=replica_folder,
+        interval=1,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
     sync_thread = Thread(
         target=handle_sync, args=(args,)
     )  # multiple functions are running concurrently in the same process, using threads is beneficial for testing
     # scenarios where verifying synchronisation, interruption, or completion behaviours without blocking the main thread
 
+    sync._cycle_complete.clear()
     sync_thread.start()
 
-    time.sleep(1)
-
-    assert {file.name for file in get_all_files(pathlib.Path(replica_folder))} == {
+    assert sync._cycle_complete.wait(timeout=5), "Expected a round of synchronisation to complete."
+    assert {os.path.basename(file) for file in get_all_files(replica_folder)} == {
         os.path.basename(source_file)
     }, "Expected files to be synchronised."
 
@@ -505,18 +1276,158 @@ def test_handle_sync():
     source_file = create_temporary_file(source_folder, "source_file.txt", "This is some content.")
     replica_folder = create_temporary_folder()
 
-    args = argparse.Namespace(source=source_folder, replica=replica_folder, interval=1)
-
+    # the interval is far longer than the join below, the shutdown signal has to cut the wait short
+    args = argparse.Namespace(
+        source=source_folder,
+        replica=replica_folder,
+        interval=60,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
+
+    sync.shutdown_event.clear()
+    sync._cycle_complete.clear()
     sync_thread = Thread(target=handle_sync, args=(args,))
     sync_thread.start()
 
-    time.sleep(1)
+    assert sync._cycle_complete.wait(timeout=5), "Expected a round of synchronisation to complete."
 
-    sync.shutdown_flag = True
+    sync.shutdown_handler(signal.SIGINT, None)
 
-    sync_thread.join()
+    sync_thread.join(timeout=5)
 
     assert not sync_thread.is_alive(), "Expected synchronisation process to be interrupted."
 
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_handle_sync_own_changes(caplog):
+    """
+    Unit test for handle_sync while watching for changes.
+
+    Checks that a change of the source makes a single round, i.e. the writes of that round to the replica do not
+    make another one.
+    """
+
+    source_folder = create_temporary_folder()
+    source_file = create_temporary_file(source_folder, "source_file.txt", "This is some content.")
+    replica_folder = create_temporary_folder()
+    args = argparse.Namespace(
+        source=source_folder,
+        replica=replica_folder,
+        interval=0.5,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
+
+    caplog.set_level(logging.INFO, logger="filderflux.commands.sync.sync")
+    sync.shutdown_event.clear()
+    sync._cycle_complete.clear()
+    sync_thread = Thread(target=handle_sync, args=(args,))
+    sync_thread.start()
+    assert sync._cycle_complete.wait(timeout=5), "Expected the first round to complete."
+
+    # the first wait watches the replica tree, the change is made once it is watched
+    time.sleep(0.1)
+    create_temporary_file(source_folder, "source_file.txt", "This is some changed content.")
+    deadline = time.monotonic() + 5
+    while "Round 2 " not in caplog.text and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(1.5)  # three intervals without changes
+
+    sync.shutdown_handler(signal.SIGINT, None)
+    sync_thread.join(timeout=5)
+
+    assert "Round 2 of synchronisation: 1 files copied" in caplog.text, "Expected the change to be synchronised."
+    assert "Round 3 " not in caplog.text, "Expected no round caused by the writes to the replica."
+    with open(os.path.join(replica_folder, "source_file.txt"), "r") as file:
+        assert file.read() == "This is some changed content.", "Expected the replica file to be updated."
+    assert os.path.exists(source_file), "Expected the source file to stay."
+
+
+def test_handle_sync_source_manifest(caplog):
+    """
+    Unit test for handle_sync with a source file of the manifest's name.
+
+    Checks that the source file is replicated instead of the manifest and that this is logged once,
+    not in every round.
+    """
+
+    source_folder = create_temporary_folder()
+    create_temporary_file(source_folder, sync.MANIFEST_NAME, "This is not a manifest.")
+    replica_folder = create_temporary_folder()
+    args = argparse.Namespace(
+        source=source_folder,
+        replica=replica_folder,
+        interval=0.2,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
+
+    caplog.set_level(logging.INFO, logger="filderflux.commands.sync.sync")
+    sync.shutdown_event.clear()
+    sync_thread = Thread(target=handle_sync, args=(args,))
+    sync_thread.start()
+    time.sleep(1.1)  # several intervals
+    sync.shutdown_handler(signal.SIGINT, None)
+    sync_thread.join(timeout=5)
+
+    assert caplog.text.count("the manifest of digests is not saved") == 1, "Expected a single warning."
+    with open(os.path.join(replica_folder, sync.MANIFEST_NAME), "r") as file:
+        assert file.read() == "This is not a manifest.", "Expected the source file to be replicated."
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_handle_sync_replica_removed():
+    """
+    Unit test for handle_sync while watching for changes.
+
+    Checks that a removed replica folder is created again and watched anew, i.e. a file added to it afterwards
+    is removed without waiting for the interval.
+    """
+
+    source_folder = create_temporary_folder()
+    create_temporary_file(source_folder, "source_file.txt", "This is some content.")
+    replica_folder = create_temporary_folder()
+    replica_file = os.path.join(replica_folder, "source_file.txt")
+    args = argparse.Namespace(
+        source=source_folder,
+        replica=replica_folder,
+        interval=30,
+        checksum=False,
+        reflink="auto",
+        hash="sha256",
+        link=False,
+    )
+
+    def wait_until(condition, timeout: float = 5) -> bool:
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return condition()
+
+    sync.shutdown_event.clear()
+    sync._cycle_complete.clear()
+    sync_thread = Thread(target=handle_sync, args=(args,))
+    sync_thread.start()
+    assert sync._cycle_complete.wait(timeout=5), "Expected the first round to complete."
+
+    # the first wait watches the replica tree, it is removed once it is watched
+    time.sleep(0.1)
     shutil.rmtree(replica_folder)
-    shutil.rmtree(source_folder)
+    recreated = wait_until(lambda: os.path.exists(replica_file))
+
+    time.sleep(0.1)
+    redundant_file = create_temporary_file(replica_folder, "redundant_file.txt") if recreated else ""
+    removed = wait_until(lambda: not os.path.exists(redundant_file))
+
+    sync.shutdown_handler(signal.SIGINT, None)
+    sync_thread.join(timeout=5)
+
+    assert recreated, "Expected the removed replica folder to be created again."
+    assert removed, "Expected the file added to the recreated replica folder to be removed."
@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+
+import pytest
+
+from filderflux.commands.sync.watcher import InotifyWatcher, create_watcher
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_inotify_watcher(tmp_path):
+    """
+    Unit test for the InotifyWatcher class.
+
+    - Tests that no changes are reported while nothing happens.
+    - Tests that creating a file reports its folder.
+    - Tests that a newly created subfolder is watched as well.
+    - Tests that removing a file reports its folder.
+    - Tests that changes of ignored paths are not reported, other entries of the same name are.
+
+    Raises AssertionError if the reported folders are not as expected.
+    """
+
+    folder = str(tmp_path)
+    watcher = InotifyWatcher(ignored_paths=(os.path.join(folder, "ignored.txt"),))
+    watcher.watch_tree(folder)
+
+    assert watcher.read_changes() == set(), "Expected no changes."
+
+    with open(os.path.join(folder, "file.txt"), "w") as file:
+        file.write("Sample content.")
+    assert watcher.read_changes() == {folder}, "Expected the folder of the new file to be reported."
+
+    subfolder = os.path.join(folder, "subfolder")
+    os.mkdir(subfolder)
+    assert watcher.read_changes() == {folder, subfolder}, "Expected the new subfolder to be reported."
+
+    with open(os.path.join(subfolder, "subfile.txt"), "w") as file:
+        file.write("Sample content.")
+    assert watcher.read_changes() == {subfolder}, "Expected the new subfolder to be watched."
+
+    os.remove(os.path.join(folder, "file.txt"))
+    assert watcher.read_changes() == {folder}, "Expected the folder of the removed file to be reported."
+
+    with open(os.path.join(folder, "ignored.txt"), "w") as file:
+        file.write("Sample content.")
+    assert watcher.read_changes() == set(), "Expected the ignored file not to be reported."
+
+    with open(os.path.join(subfolder, "ignored.txt"), "w") as file:
+        file.write("Sample content.")
+    assert watcher.read_changes() == {subfolder}, "Expected a file of the same name elsewhere to be reported."
+
+    watcher.close()
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_inotify_watcher_wait(tmp_path):
+    """
+    Unit test for the wait and wake methods of the InotifyWatcher class.
+
+    - Tests that waiting without any change times out.
+    - Tests that a pending event ends the wait.
+    - Tests that wake ends the wait without reporting events.
+    """
+
+    folder = str(tmp_path)
+    watcher = InotifyWatcher()
+    watcher.watch_tree(folder)
+
+    assert not watcher.wait(0.01), "Expected the wait to time out without changes."
+
+    with open(os.path.join(folder, "file.txt"), "w") as file:
+        file.write("Sample content.")
+    assert watcher.wait(5), "Expected the wait to end on a change."
+    assert watcher.read_changes() == {folder}, "Expected the folder of the new file to be reported."
+
+    watcher.wake()
+    start = time.monotonic()
+    assert not watcher.wait(5), "Expected no events after waking up."
+    assert time.monotonic() - start < 1, "Expected wake to end the wait immediately."
+
+    watcher.close()
+    watcher.wake()  # waking a closed watcher is harmless
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only available on Linux")
+def test_inotify_watcher_unwatched(tmp_path):
+    """
+    Unit test for the take_unwatched method of the InotifyWatcher class.
+
+    - Tests that a removed root is reported once, so that it can be watched again.
+    - Tests that a root which cannot be watched is reported.
+    - Tests that a root watched again reports changes.
+    """
+
+    folder = os.path.join(str(tmp_path), "root")
+    os.mkdir(folder)
+    watcher = InotifyWatcher()
+    watcher.watch_tree(folder)
+    assert watcher.take_unwatched() == set(), "Expected the root to be watched."
+
+    os.rmdir(folder)
+    watcher.read_changes()
+    assert watcher.take_unwatched() == {folder}, "Expected the removed root to be reported."
+    assert watcher.take_unwatched() == set(), "Expected the removed root to be reported once."
+
+    watcher.watch_tree(folder)
+    assert watcher.take_unwatched() == {folder}, "Expected the missing root to be reported."
+
+    os.mkdir(folder)
+    watcher.watch_tree(folder)
+    with open(os.path.join(folder, "file.txt"), "w") as file:
+        file.write("Sample content.")
+    assert watcher.read_changes() == {folder}, "Expected the root watched again to report changes."
+
+    watcher.close()
+
+
+def test_create_watcher(tmp_path):
+    """
+    Unit test for the create_watcher function.
+
+    Checks that a watcher is created for an existing folder on Linux and that no watcher is created elsewhere.
+    """
+
+    folder = str(tmp_path)
+    watcher = create_watcher(folder)
+
+    if sys.platform.startswith("linux"):
+        assert watcher is not None, "Expected a watcher on Linux."
+        watcher.close()
+    else:
+        assert watcher is None, "Expected no watcher outside Linux."
@@ -0,0 +1,268 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+from typing import Collection, Dict, FrozenSet, Optional, Set, Union
+import pathlib
+
+logger = logging.getLogger(__name__)
+
+# inotify constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+# struct inotify_event {int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[];}
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+
+
+class InotifyWatcher:
+    """
+    Watches folder trees for changes using inotify, so that rounds of synchronisation can be skipped
+    while nothing changes.
+
+    Every folder of a watched tree gets its own watch, folders created later are watched as soon as their
+    creation is read. Only available on Linux.
+
+    Args:
+    ignored_paths (Collection[str]): Paths to entries whose changes are not reported (e.g. files written
+    by the synchronisation itself).
+    """
+
+    def __init__(self, ignored_paths: Collection[str] = ()) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        # written to by wake, so that a wait for events can be cut short from a signal handler or another thread
+        self._wake_read, self._wake_write = os.pipe()
+        for fd in (self._wake_read, self._wake_write):
+            os.set_blocking(fd, False)
+        self._watches: Dict[int, str] = {}
+        # folders whose watches were removed (e.g. the folders were deleted) since take_unwatched was called
+        self._unwatched: Set[str] = set()
+        self._ignored_paths: FrozenSet[str] = frozenset(os.path.normpath(path) for path in ignored_paths)
+        # checked first, so that only events of entries with the same name need their full path built
+        self._ignored_names: FrozenSet[bytes] = frozenset(
+            os.fsencode(os.path.basename(path)) for path in self._ignored_paths
+        )
+
+    def close(self) -> None:
+        """
+        Close the inotify instance, removing all watches.
+        """
+
+        if self._fd >= 0:
+            os.close(self._fd)
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+            self._fd = -1
+            self._watches.clear()
+            self._unwatched.clear()
+
+    def wake(self) -> None:
+        """
+        Cut short a wait for events running in another thread (or interrupted by a signal handler).
+        """
+
+        if self._fd >= 0:
+            try:
+                os.write(self._wake_write, b"\0")
+            except OSError:
+                pass  # the pipe is full (the waiter is woken up anyway) or closed meanwhile
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until events are pending, wake is called or the timeout elapses.
+
+        Args:
+        timeout (float): The maximum time to wait in seconds.
+
+        Returns:
+        bool: True if events are pending (to be read by read_changes), False otherwise.
+        """
+
+        readable, _, _ = select.select([self._fd, self._wake_read], [], [], max(timeout, 0))
+        if self._wake_read in readable:
+            try:
+                while os.read(self._wake_read, READ_SIZE):
+                    pass
+            except BlockingIOError:
+                pass
+        return self._fd in readable
+
+    def watch(self, folder_path: Union[str, pathlib.Path]) -> None:
+        """
+        Watch a single folder for changes of its entries.
+
+        Args:
+        folder_path (Union[str, pathlib.Path]): The path to the folder to be watched.
+
+        Raises:
+        OSError: If the folder cannot be watched, e.g. the limit of watches is reached (ENOSPC).
+        """
+
+        path = os.fspath(folder_path)
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), path)
+        self._watches[wd] = path
+
+    def watch_tree(self, folder_path: Union[str, pathlib.Path]) -> None:
+        """
+        Watch a folder and all its subfolders for changes. Folders which disappear meanwhile are skipped.
+
+        Args:
+        folder_path (Union[str, pathlib.Path]): The path to the root folder of the tree to be watched.
+
+        Raises:
+        OSError: If the limit of watches is reached (ENOSPC) or inotify fails otherwise.
+        """
+
+        root_path = os.fspath(folder_path)
+        stack = [root_path]
+        while stack:
+            path = stack.pop()
+            try:
+                self.watch(path)
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+            except (FileNotFoundError, NotADirectoryError):
+                if path == root_path:
+                    self._unwatched.add(path)  # reported by take_unwatched, so that the caller can try again
+                continue
+
+    def take_unwatched(self) -> Set[str]:
+        """
+        Take the folders whose watches were removed since the last call, e.g. because the folders were deleted,
+        and the roots watch_tree could not watch. A root among them has to be watched again by watch_tree.
+
+        Returns:
+        Set[str]: A set containing paths to the folders which are not watched anymore.
+        """
+
+        unwatched, self._unwatched = self._unwatched, set()
+        return unwatched
+
+    def read_changes(self) -> Optional[Set[str]]:
+        """
+        Read all pending events without blocking and collect the folders they happened in.
+
+        Returns:
+        Optional[Set[str]]: A set containing paths to folders whose entries changed (empty if nothing changed),
+        or None if events were lost and everything has to be considered changed.
+        """
+
+        changed: Set[str] = set()
+        overflow = False
+
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            except InterruptedError:
+                continue
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                start = offset + EVENT_HEADER.size
+                offset = start + length
+                name = data[start:offset].rstrip(b"\0")
+
+                if mask & IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+
+                path = self._watches.get(wd)
+                if path is None:
+                    continue
+                if mask & IN_IGNORED:
+                    del self._watches[wd]  # the folder was removed or moved away
+                    self._unwatched.add(path)
+                    continue
+                if (
+                    name in self._ignored_names
+                    and os.path.normpath(os.path.join(path, os.fsdecode(name))) in self._ignored_paths
+                ):
+                    continue
+
+                changed.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    new_folder = os.path.join(path, os.fsdecode(name))
+                    changed.add(new_folder)
+                    self.watch_tree(new_folder)
+
+        return None if overflow else changed
+
+
+def create_watcher(
+    *folder_paths: Union[str, pathlib.Path], ignored_paths: Collection[str] = ()
+) -> Optional[InotifyWatcher]:
+    """
+    Create a watcher of the given folder trees, if the platform supports it.
+
+    Args:
+    *folder_paths (Union[str, pathlib.Path]): The paths to the root folders of the trees to be watched.
+    ignored_paths (Collection[str]): Paths to entries whose changes are not reported.
+
+    Returns:
+    Optional[InotifyWatcher]: The watcher, or None if the trees cannot be watched (the caller then polls).
+    """
+
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        watcher = InotifyWatcher(ignored_paths)
+    except (AttributeError, OSError) as e:
+        logger.warning("Change notifications are not available, polling instead: %s", e)
+        return None
+
+    try:
+        for folder_path in folder_paths:
+            watcher.watch_tree(folder_path)
+    except OSError as e:
+        watcher.close()
+        if e.errno == errno.ENOSPC:
+            logger.warning("Too many folders to watch (see fs.inotify.max_user_watches), polling instead.")
+        else:
+            logger.warning("Cannot watch %s, polling instead: %s", e.filename, e)
+        return None
+
+    return watcher
@@ -1,6 +1,7 @@
 # Testing functionality:
 # - sample testing file
 # - mocking external version function from importlib to avoid test dependency on git tag
+# - clearing the cache of cli_version so that every test reads the mocked version
 
 from unittest.mock import patch
 from importlib.metadata import PackageNotFoundError
@@ -11,10 +12,20 @@ MOCK_VERSION = "0.0.5"
 
 
 def test_cli_version_installed():
-    with patch("filderflux.commands.version.version.version", return_value=MOCK_VERSION):
+    cli_version.cache_clear()
+    with patch("importlib.metadata.version", return_value=MOCK_VERSION):
         assert cli_version() == MOCK_VERSION
 
 
 def test_cli_version_not_installed():
-    with patch("filderflux.commands.version.version.version", side_effect=PackageNotFoundError):
+    cli_version.cache_clear()
+    with patch("importlib.metadata.version", side_effect=PackageNotFoundError):
         assert cli_version() == ""
+
+
+def test_cli_version_cached():
+    cli_version.cache_clear()
+    with patch("importlib.metadata.version", return_value=MOCK_VERSION) as version:
+        assert cli_version() == MOCK_VERSION
+        assert cli_version() == MOCK_VERSION
+    version.assert_called_once_with("filderflux")
@@ -1,15 +1,21 @@
 import argparse
-from importlib.metadata import PackageNotFoundError, version
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=None)
 def cli_version() -> str:
     """
     Retrieve the version of the 'filderflux' package using git tag.
+
+    The metadata is read only once, the version does not change while the process runs.
     """
 
+    # imported here, importlib.metadata alone takes tens of milliseconds to import on every start of the CLI
+    from importlib.metadata import PackageNotFoundError, version
+
     try:
         return version("filderflux")
     except PackageNotFoundError:
@@ -23,6 +29,6 @@ def handle_version(args: argparse.Namespace) -> None:
 
     version = cli_version()
     if version:
-        logger.info(f"Version of filderflux is {version}.")
+        logger.info("Version of filderflux is %s.", version)
     else:
         logger.warning("Package is not installed.")
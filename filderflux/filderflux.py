@@ -1,39 +1,64 @@
 import argparse
+import atexit
+import functools
 from filderflux.commands.version import add_version_parser
 from filderflux.commands.sync import add_sync_parser
 import logging
+import logging.handlers
+import queue
 import sys
 
 
 def configure_logger(args: argparse.Namespace):
     # Configures the root_logger with a console handler to output log messages to stdout.
     # Adds a file handler to log messages to the specified file.
+    # Every copied/removed entry is logged only with --verbose, --quiet leaves warnings and errors only.
+    # The handlers write on a background thread, logging from the synchronisation only puts records in a queue.
+
+    level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
 
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
+    root_logger.setLevel(level)
 
     formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(filename)s:%(message)s")
 
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
+    console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
 
     file_handler = logging.FileHandler(args.log_file)
-    file_handler.setLevel(logging.INFO)
+    file_handler.setLevel(level)
     file_handler.setFormatter(formatter)
-    root_logger.addHandler(file_handler)
 
+    # SimpleQueue is reentrant, the SIGINT handler logs and may interrupt a put of the main thread
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    listener.start()
+    # the records still queued are written before the process exits
+    atexit.register(listener.stop)
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser() -> argparse.ArgumentParser:
+    # Builds the parser with all subcommands once, later calls reuse it.
 
-def process_parser():
     parser = argparse.ArgumentParser(description="Simple tool for folder synchronisation")
     parser.add_argument("-l", "--log-file", type=str, required=True, help="Path to the logfile")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("-v", "--verbose", action="store_true", help="Log every copied, removed and created entry")
+    verbosity.add_argument("-q", "--quiet", action="store_true", help="Log only warnings and errors")
     subparsers = parser.add_subparsers(help="Available commands")
 
     # your commands go here
     add_version_parser(subparsers)
     add_sync_parser(subparsers)
 
+    return parser
+
+
+def process_parser():
+    parser = get_parser()
     args = parser.parse_args()
     configure_logger(args)
 